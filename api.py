@@ -0,0 +1,351 @@
+import asyncio
+import hmac
+import json
+import logging
+import mimetypes
+import os
+import tempfile
+import threading
+from http import HTTPStatus
+from urllib.parse import unquote, urlparse
+
+from dotenv import load_dotenv
+
+from estimator import MODES
+from runs import OsaRun, get_run_manager
+from runtime import get_event_loop_thread
+from scheduler import PRIORITY_BULK, PRIORITY_CLASSES
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_API_HOST = "127.0.0.1"
+DEFAULT_API_PORT = 8502
+MAX_BODY_SIZE = 1024 * 1024
+# Seconds between keepalive comments on an idle log stream; writing them is
+# what reveals a client that has gone away
+KEEPALIVE_INTERVAL = 15
+
+
+class HTTPError(Exception):
+    def __init__(self, status: HTTPStatus, message: str = None) -> None:
+        super().__init__(message or status.phrase)
+        self.status = status
+        self.message = message or status.phrase
+
+
+def _option(body: dict, name: str, required: bool = False) -> str:
+    """Return a string option that is safe to pass as an osa-tool argument."""
+    value = body.get(name)
+    if value is None and not required:
+        return None
+    if not isinstance(value, str) or not value.strip():
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"{name} must be a non-empty string")
+    value = value.strip()
+    # A leading dash would be parsed as another osa-tool option
+    if value.startswith("-"):
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"{name} must not start with '-'")
+    return value
+
+
+def _flag(body: dict, name: str) -> bool:
+    value = body.get(name, False)
+    if not isinstance(value, bool):
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"{name} must be a boolean")
+    return value
+
+
+def _parse_options(body: dict) -> dict:
+    repo_url = _option(body, "repo_url", required=True)
+    mode = body.get("mode", "auto")
+    if mode not in MODES:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"mode must be one of {MODES}")
+    article = _option(body, "article")
+    # osa-tool also accepts local files, which must not be reachable over the API
+    if article is not None:
+        url = urlparse(article)
+        if url.scheme not in ("http", "https") or not url.netloc:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "article must be an http(s) URL")
+    return {
+        "repo_url": repo_url,
+        "mode": mode,
+        "article": article,
+        "branch": _option(body, "branch"),
+        "no_fork": _flag(body, "no_fork"),
+        "no_pull_request": _flag(body, "no_pull_request"),
+    }
+
+
+class ApiServer:
+    """Minimal HTTP/1.1 service for submitting and polling osa-tool runs.
+
+    Routes:
+        POST /runs                submit a run (JSON body)
+        GET  /runs/{id}           run status, queue position and estimates
+        GET  /runs/{id}/logs      console output as server-sent events
+        GET  /runs/{id}/about     generated About section
+        GET  /runs/{id}/report    PDF report
+        GET  /runs/{id}/artifacts           files written to the output directory
+        GET  /runs/{id}/artifacts/{name}    download one of those files
+    """
+
+    def __init__(self, tokens: dict) -> None:
+        self.tokens = tokens
+        self.run_manager = get_run_manager()
+
+    def authenticate(self, headers: dict) -> str:
+        scheme, _, token = headers.get("authorization", "").partition(" ")
+        if scheme.lower() == "bearer":
+            for user, expected in self.tokens.items():
+                if hmac.compare_digest(token.encode(), expected.encode()):
+                    return user
+        raise HTTPError(HTTPStatus.UNAUTHORIZED)
+
+    def get_run(self, user: str, run_id: str) -> OsaRun:
+        run = self.run_manager.get(run_id)
+        if run is None or run.user != user:
+            raise HTTPError(HTTPStatus.NOT_FOUND, "Run not found")
+        return run
+
+    async def handle(self, reader, writer) -> None:
+        try:
+            method, path, headers, body = await self.read_request(reader)
+            user = self.authenticate(headers)
+            await self.route(writer, user, method, path, body)
+        except HTTPError as e:
+            await self.send_json(writer, {"error": e.message}, e.status)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            logger.error(f"API request failed: {e!s}", exc_info=True)
+            await self.send_json(
+                writer, {"error": "Internal error"}, HTTPStatus.INTERNAL_SERVER_ERROR
+            )
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def read_request(self, reader) -> tuple:
+        request_line = (await reader.readline()).decode("latin-1").split()
+        if len(request_line) != 3:
+            raise HTTPError(HTTPStatus.BAD_REQUEST)
+        method, path, _ = request_line
+        headers = {}
+        while line := (await reader.readline()).decode("latin-1").strip():
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get("content-length", 0) or 0)
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+        if length < 0:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+        if length > MAX_BODY_SIZE:
+            raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+        body = await reader.readexactly(length) if length else b""
+        return method, path.split("?", 1)[0], headers, body
+
+    async def route(self, writer, user: str, method: str, path: str, body) -> None:
+        parts = [part for part in path.split("/") if part]
+        if parts == ["runs"] and method == "POST":
+            await self.submit(writer, user, body)
+        elif len(parts) == 2 and parts[0] == "runs" and method == "GET":
+            run = self.get_run(user, parts[1])
+            await self.send_json(writer, run.to_dict())
+        elif len(parts) == 3 and parts[0] == "runs" and method == "GET":
+            run = self.get_run(user, parts[1])
+            if parts[2] == "logs":
+                await self.stream_logs(writer, run)
+            elif parts[2] == "about":
+                await self.send_json(writer, {"about": run.about_section or None})
+            elif parts[2] == "report":
+                report_path = run.get_report_path()
+                if report_path is None or not os.path.exists(report_path):
+                    raise HTTPError(HTTPStatus.NOT_FOUND, "PDF report was not created")
+                await self.send_file(writer, report_path)
+            elif parts[2] == "artifacts":
+                await self.send_json(writer, {"artifacts": run.list_artifacts()})
+            else:
+                raise HTTPError(HTTPStatus.NOT_FOUND)
+        elif len(parts) > 3 and parts[:1] + parts[2:3] == ["runs", "artifacts"]:
+            run = self.get_run(user, parts[1])
+            if method != "GET":
+                raise HTTPError(HTTPStatus.NOT_FOUND)
+            # Only recorded artifacts are served, so the name cannot escape the run
+            artifact = run.get_artifact(unquote("/".join(parts[3:])))
+            if artifact is None:
+                raise HTTPError(HTTPStatus.NOT_FOUND, "Artifact not found")
+            await self.send_file(writer, artifact["path"])
+        else:
+            raise HTTPError(HTTPStatus.NOT_FOUND)
+
+    async def submit(self, writer, user: str, body: bytes) -> None:
+        try:
+            data = json.loads(body or b"{}")
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Body must be JSON")
+        if not isinstance(data, dict):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Body must be a JSON object")
+        priority = data.get("priority", PRIORITY_BULK)
+        if not isinstance(priority, str) or priority not in PRIORITY_CLASSES:
+            raise HTTPError(
+                HTTPStatus.BAD_REQUEST,
+                f"priority must be one of {tuple(PRIORITY_CLASSES)}",
+            )
+        run = self.run_manager.start_run(
+            user,
+            _parse_options(data),
+            priority,
+            output_dir=tempfile.mkdtemp(),
+            git_token=os.getenv("GIT_TOKEN"),
+        )
+        await self.send_json(writer, run.to_dict(), HTTPStatus.ACCEPTED)
+
+    async def stream_logs(self, writer, run: OsaRun) -> None:
+        await self.send_head(
+            writer,
+            HTTPStatus.OK,
+            {"Content-Type": "text/event-stream", "Cache-Control": "no-cache"},
+        )
+        sent, artifacts_sent = 0, 0
+        while True:
+            try:
+                async with run.updated:
+                    await asyncio.wait_for(
+                        run.updated.wait_for(
+                            lambda: len(run.logs) > sent
+                            or len(run.artifact_events) > artifacts_sent
+                            or run.done
+                        ),
+                        KEEPALIVE_INTERVAL,
+                    )
+            except asyncio.TimeoutError:
+                writer.write(b": keepalive\n\n")
+                await writer.drain()
+                continue
+            for line in run.logs[sent:]:
+                writer.write(f"data: {line}\n\n".encode())
+            sent = len(run.logs)
+            for artifact in run.artifact_events[artifacts_sent:]:
+                payload = json.dumps(
+                    {"name": artifact["name"], "size": artifact["size"]}
+                )
+                writer.write(f"event: artifact\ndata: {payload}\n\n".encode())
+            artifacts_sent = len(run.artifact_events)
+            if run.done:
+                payload = json.dumps({"exit_code": run.exit_code, "status": run.status})
+                writer.write(f"event: end\ndata: {payload}\n\n".encode())
+                await writer.drain()
+                return
+            await writer.drain()
+
+    async def send_file(self, writer, path: str) -> None:
+        with open(path, "rb") as file:
+            data = file.read()
+        filename = os.path.basename(path)
+        content_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        await self.send_head(
+            writer,
+            HTTPStatus.OK,
+            {
+                "Content-Type": content_type,
+                "Content-Length": str(len(data)),
+                "Content-Disposition": f'attachment; filename="{filename}"',
+            },
+        )
+        writer.write(data)
+        await writer.drain()
+
+    async def send_head(self, writer, status: HTTPStatus, headers: dict) -> None:
+        lines = [f"HTTP/1.1 {status.value} {status.phrase}", "Connection: close"]
+        lines.extend(f"{name}: {value}" for name, value in headers.items())
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+        await writer.drain()
+
+    async def send_json(
+        self, writer, data: dict, status: HTTPStatus = HTTPStatus.OK
+    ) -> None:
+        body = json.dumps(data).encode()
+        await self.send_head(
+            writer,
+            status,
+            {"Content-Type": "application/json", "Content-Length": str(len(body))},
+        )
+        writer.write(body)
+        await writer.drain()
+
+
+def parse_tokens(value: str) -> dict:
+    """Parse ``user:token`` pairs separated by commas."""
+    tokens = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        user, _, token = item.partition(":")
+        if user and token:
+            tokens[user.strip()] = token.strip()
+        else:
+            logger.warning("Ignoring malformed entry in OSA_API_TOKENS")
+    return tokens
+
+
+async def serve(host: str, port: int, tokens: dict) -> None:
+    server = ApiServer(tokens)
+    async with await asyncio.start_server(server.handle, host, port) as http_server:
+        logger.info(f"OSA API listening on http://{host}:{port}")
+        await http_server.serve_forever()
+
+
+def _log_server_exit(future) -> None:
+    if not future.cancelled() and future.exception() is not None:
+        logger.error(f"OSA API stopped: {future.exception()!s}")
+
+
+_api_started = False
+_api_lock = threading.Lock()
+
+
+def start_api_server() -> bool:
+    """Start the HTTP API on the shared event loop if it is configured.
+
+    Running inside the Streamlit process lets API runs share the scheduler,
+    and therefore the concurrency limits, with the UI. Returns whether this
+    call started the server; it is started at most once per process.
+    """
+    global _api_started
+    port = os.getenv("OSA_API_PORT")
+    tokens = parse_tokens(os.getenv("OSA_API_TOKENS", ""))
+    if not port:
+        return False
+    if not tokens:
+        logger.error("OSA_API_PORT is set but OSA_API_TOKENS is empty, API disabled")
+        return False
+    with _api_lock:
+        if _api_started:
+            return False
+        _api_started = True
+    host = os.getenv("OSA_API_HOST", DEFAULT_API_HOST)
+    future = get_event_loop_thread().submit(serve(host, int(port), tokens))
+    future.add_done_callback(_log_server_exit)
+    return True
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+    )
+    tokens = parse_tokens(os.getenv("OSA_API_TOKENS", ""))
+    if not tokens:
+        raise SystemExit("OSA_API_TOKENS must define at least one user:token pair")
+    logger.warning(
+        "Running the API without the UI: its runs do not share concurrency "
+        "limits with a separate Streamlit server, use serve.py for that"
+    )
+    get_event_loop_thread().submit(
+        serve(
+            os.getenv("OSA_API_HOST", DEFAULT_API_HOST),
+            int(os.getenv("OSA_API_PORT", DEFAULT_API_PORT)),
+            tokens,
+        )
+    ).result()
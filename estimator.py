@@ -0,0 +1,196 @@
+import http.client
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+import urllib.request
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+MODES = ("basic", "auto", "advanced")
+DEFAULT_HISTORY_PATH = "run_history.jsonl"
+MIN_TRAINING_RUNS = 5
+# Only the most recent runs are used for training
+MAX_TRAINING_RUNS = 500
+# The model is refitted once this many new runs have been recorded
+REFIT_INTERVAL = 10
+RIDGE_PENALTY = 1.0
+
+
+def fetch_repo_stats(repo_url: str, git_token: str = None, branch: str = None) -> dict:
+    """Return the size (KB) and file count of a GitHub repository, if reachable."""
+    match = re.match(r"https?://github\.com/([^/]+)/([^/#?]+)", repo_url.strip())
+    if not match:
+        return {}
+    owner, repo = match.group(1), match.group(2).removesuffix(".git")
+    headers = {"Accept": "application/vnd.github+json"}
+    if git_token:
+        headers["Authorization"] = f"Bearer {git_token}"
+
+    def get(path: str) -> dict:
+        request = urllib.request.Request(
+            f"https://api.github.com/repos/{owner}/{repo}{path}", headers=headers
+        )
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return json.load(response)
+
+    stats = {}
+    try:
+        info = get("")
+        stats["size_kb"] = info.get("size", 0)
+        tree = get(f"/git/trees/{branch or info['default_branch']}?recursive=1")
+        stats["file_count"] = sum(
+            entry.get("type") == "blob" for entry in tree.get("tree", [])
+        )
+    except (
+        OSError, http.client.HTTPException, AttributeError, KeyError, ValueError
+    ) as e:
+        # Stats are optional, so keep whatever was read before the failure
+        logger.warning(f"Could not fetch repository stats for {repo_url}: {e!s}")
+    return stats
+
+
+def _solve(matrix: list, vector: list) -> list:
+    """Solve a small dense linear system with Gauss-Jordan elimination."""
+    size = len(vector)
+    rows = [row[:] + [value] for row, value in zip(matrix, vector)]
+    for col in range(size):
+        pivot = max(range(col, size), key=lambda r: abs(rows[r][col]))
+        rows[col], rows[pivot] = rows[pivot], rows[col]
+        if abs(rows[col][col]) < 1e-12:
+            continue
+        for r in range(size):
+            if r != col:
+                factor = rows[r][col] / rows[col][col]
+                rows[r] = [a - factor * b for a, b in zip(rows[r], rows[col])]
+    return [
+        row[size] / row[i] if abs(row[i]) >= 1e-12 else 0.0
+        for i, row in enumerate(rows)
+    ]
+
+
+class RuntimeEstimator:
+    """Predict osa-tool run durations from previously completed runs.
+
+    Fits a ridge regression of the log duration on the repository size and
+    file count, the mode and whether an article is attached, the inputs that
+    reach the osa-tool command line. Until enough runs are recorded, the
+    mean duration is used.
+    The model is trained on the last ``MAX_TRAINING_RUNS`` runs and refitted
+    by ``record`` every ``REFIT_INTERVAL`` runs, so ``predict`` stays cheap.
+    """
+
+    def __init__(self, history_path: str = DEFAULT_HISTORY_PATH) -> None:
+        self.history_path = history_path
+        self._lock = threading.Lock()
+        self._records = self._load()
+        self._model = None
+        self._unfitted = 0
+        if len(self._records) >= MIN_TRAINING_RUNS:
+            self._model = _fit(list(self._records))
+
+    def _load(self) -> deque:
+        records = deque(maxlen=MAX_TRAINING_RUNS)
+        if not os.path.exists(self.history_path):
+            return records
+        with open(self.history_path, encoding="utf-8") as file:
+            for line in file:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+        return records
+
+    def record(self, features: dict, duration: float) -> None:
+        """Store the duration of a finished run, refitting the model if due.
+
+        Fitting and writing the history block, so call this off the event loop.
+        """
+        record = {"features": features, "duration": duration, "time": time.time()}
+        with self._lock:
+            self._records.append(record)
+            self._unfitted += 1
+            due = len(self._records) >= MIN_TRAINING_RUNS and (
+                self._model is None or self._unfitted >= REFIT_INTERVAL
+            )
+            if due:
+                self._unfitted = 0
+                records = list(self._records)
+            try:
+                with open(self.history_path, "a", encoding="utf-8") as file:
+                    file.write(json.dumps(record) + "\n")
+            except OSError as e:
+                logger.warning(f"Could not save run history: {e!s}")
+        if due:
+            model = _fit(records)
+            with self._lock:
+                self._model = model
+
+    def predict(self, features: dict, default: float) -> float:
+        """Return the expected run duration in seconds."""
+        with self._lock:
+            model = self._model
+            if model is None:
+                if not self._records:
+                    return default
+                return sum(r["duration"] for r in self._records) / len(self._records)
+        coefficients, means = model
+        vector = _vectorize(features, means)
+        log_duration = sum(c * x for c, x in zip(coefficients, vector))
+        return math.exp(min(log_duration, 12.0))
+
+
+def _vectorize(features: dict, means: dict) -> list:
+    def numeric(name: str) -> float:
+        value = features.get(name)
+        if value is None:
+            return means.get(name, 0.0)
+        return math.log1p(value)
+
+    return (
+        [1.0, numeric("size_kb"), numeric("file_count")]
+        + [float(features.get("mode") == mode) for mode in MODES[1:]]
+        + [float(bool(features.get("article")))]
+    )
+
+
+def _fit(records: list) -> tuple:
+    """Return the ridge coefficients and the feature means used for gaps."""
+    means = {}
+    for name in ("size_kb", "file_count"):
+        values = [
+            math.log1p(r["features"][name])
+            for r in records
+            if r["features"].get(name) is not None
+        ]
+        means[name] = sum(values) / len(values) if values else 0.0
+    rows = [_vectorize(r["features"], means) for r in records]
+    targets = [math.log(max(r["duration"], 1.0)) for r in records]
+    size = len(rows[0])
+    gram = [
+        [sum(row[i] * row[j] for row in rows) for j in range(size)]
+        for i in range(size)
+    ]
+    for i in range(1, size):
+        gram[i][i] += RIDGE_PENALTY
+    moment = [sum(row[i] * y for row, y in zip(rows, targets)) for i in range(size)]
+    return _solve(gram, moment), means
+
+
+_estimator = None
+_estimator_lock = threading.Lock()
+
+
+def get_estimator() -> RuntimeEstimator:
+    """Return the process-wide runtime estimator."""
+    global _estimator
+    with _estimator_lock:
+        if _estimator is None:
+            _estimator = RuntimeEstimator(
+                os.getenv("OSA_RUN_HISTORY", DEFAULT_HISTORY_PATH)
+            )
+        return _estimator
@@ -1,9 +1,23 @@
-import asyncio
 import tempfile
 
 import streamlit as st
 
-from utils import run_osa_tool
+from runs import get_run_manager
+from scheduler import PRIORITY_INTERACTIVE
+from utils import (
+    clear_run_output,
+    collect_run_features,
+    collect_run_options,
+    drop_removed_run_output,
+    estimate_runtime,
+    format_duration,
+    get_user_id,
+    render_artifact_picker,
+    store_run_output,
+)
+
+# Console lines shown while a run is in progress; the full log follows at the end
+PROGRESS_LOG_LINES = 200
 
 
 @st.dialog("Add an Article")
@@ -100,12 +114,92 @@ def render_input_block() -> None:
     st.container(height=5, border=False)
 
 
+def get_active_run():
+    """Return the run started by this session, if it is still tracked."""
+    if "run_id" not in st.session_state:
+        return None
+    return get_run_manager().get(st.session_state.run_id)
+
+
+@st.fragment(run_every=1)
+def render_run_progress() -> None:
+    run = get_active_run()
+    if run is None:
+        del st.session_state["run_id"]
+        st.rerun()
+    if run.done:
+        store_run_output(run.snapshot())
+        del st.session_state["run_id"]
+        st.session_state.pop("run_details", None)
+        st.rerun()
+    # Console output and artifacts are only copied again when the run changed
+    details = st.session_state.get("run_details")
+    if not details or (details["id"], details["version"]) != (run.id, run.version):
+        details = run.snapshot(log_tail=PROGRESS_LOG_LINES)
+        st.session_state.run_details = details
+    progress = run.progress()
+
+    if not st.session_state.git_token:
+        st.warning(
+            "GIT_TOKEN not found in .env file. The tool may not work correctly with private repositories."
+        )
+    left, right = st.columns([0.8, 0.2], vertical_alignment="center")
+    with left:
+        if "queue_position" in progress:
+            st.info(
+                f"**Queued**: {progress['queue_position']} run(s) ahead of you, "
+                f"estimated wait {format_duration(progress['estimated_wait'])}",
+                icon=":material/hourglass_top:",
+            )
+        elif "elapsed" in progress:
+            elapsed, estimate = progress["elapsed"], progress["estimated_runtime"]
+            if elapsed < estimate:
+                remaining = f"about {format_duration(estimate - elapsed)} remaining"
+            else:
+                remaining = (
+                    f"taking longer than the estimated {format_duration(estimate)}"
+                )
+            st.info(
+                f"**In progress**: elapsed {format_duration(elapsed)}, {remaining}",
+                icon=":material/emoji_nature:",
+            )
+        else:
+            st.info("**Preparing run...**", icon=":material/hourglass_top:")
+    with right:
+        st.button(
+            "Cancel",
+            icon=":material/cancel:",
+            use_container_width=True,
+            on_click=get_run_manager().cancel,
+            args=(run.id,),
+        )
+    if details["artifacts"]:
+        names = ", ".join(f"`{a['name']}`" for a in details["artifacts"])
+        st.caption(f"**Artifacts ready**: {names}")
+    # TODO: developer only
+    with st.expander("See Console Output", icon=":material/terminal:"):
+        st.code("\n".join(details["logs"]), height=350)
+
+
 @st.fragment
-def render_run_block(output_container) -> None:
-    if "run_osa_button" in st.session_state and st.session_state.run_osa_button == True:
-        st.session_state.running = True
-    else:
-        st.session_state.running = False
+def render_live_artifacts() -> None:
+    """Downloads for a running run, outside the auto-refreshing progress view."""
+    run = get_active_run()
+    if run is None:
+        return
+    with st.expander("Artifacts", icon=":material/folder_open:"):
+        st.button(
+            "Refresh list",
+            icon=":material/refresh:",
+            key="refresh_artifacts",
+            use_container_width=True,
+        )
+        render_artifact_picker(list(run.artifacts.values()), key_prefix="progress")
+
+
+@st.fragment
+def render_run_block() -> None:
+    st.session_state.running = get_active_run() is not None
     if st.button(
         "Run OSA",
         icon=":material/emoji_nature:",
@@ -114,15 +208,27 @@ def render_run_block(output_container) -> None:
         type="secondary" if len(st.session_state.repo_url) == 0 else "primary",
         key="run_osa_button",
     ):
-        if not st.session_state.git_token:
-            st.warning(
-                "GIT_TOKEN not found in .env file. The tool may not work correctly with private repositories."
-            )
-        _, right = st.columns([0.35, 0.5])
-        with right:
-            with st.spinner(text="In progress...", show_time=True, width="stretch"):
-                asyncio.run(run_osa_tool(output_container))
-            st.rerun()
+        features = collect_run_features()
+        clear_run_output()
+        run = get_run_manager().submit(
+            get_user_id(),
+            collect_run_options(),
+            PRIORITY_INTERACTIVE,
+            tempfile.mkdtemp(dir=st.session_state.tmpdirname),
+            git_token=st.session_state.git_token,
+            features=features,
+        )
+        st.session_state.run_id = run.id
+        st.rerun()
+    if st.session_state.running:
+        render_run_progress()
+        render_live_artifacts()
+    elif st.session_state.repo_url:
+        estimate = estimate_runtime(collect_run_features())
+        st.caption(
+            f"Estimated runtime: about {format_duration(estimate)}",
+            help="Predicted from the durations of previous runs",
+        )
 
 
 @st.fragment
@@ -137,6 +243,8 @@ def render_output_block(output_container) -> None:
                         unsafe_allow_html=True,
                     )
                     return
+                # Output directories are deleted once a finished run is pruned
+                drop_removed_run_output()
                 left, right = st.columns([0.8, 0.2], vertical_alignment="center")
                 with left:
                     if st.session_state.output_exit_code == 0:
@@ -159,6 +267,12 @@ def render_output_block(output_container) -> None:
                                 icon=":material/download:",
                                 use_container_width=True,
                             )
+                    elif st.session_state.get("output_files_removed"):
+                        with st.container(border=True):
+                            st.markdown(
+                                '<p style="text-align: center;">Run files were removed.</p>',
+                                unsafe_allow_html=True,
+                            )
                     else:
                         with st.container(border=True):
                             st.markdown(
@@ -170,6 +284,11 @@ def render_output_block(output_container) -> None:
                         "About section", expanded=True, icon=":material/article:"
                     ):
                         st.write(st.session_state.output_about_section)
+                if st.session_state.get("output_artifacts"):
+                    with st.expander("Artifacts", icon=":material/folder_open:"):
+                        render_artifact_picker(
+                            st.session_state.output_artifacts, key_prefix="output"
+                        )
                 # TODO: developer only
                 with st.expander("See Console Output", icon=":material/terminal:"):
                     st.code(
@@ -184,5 +303,5 @@ def render_main_tab() -> None:
         render_input_block()
     output_container = st.empty()
     with center:
-        render_run_block(output_container)
+        render_run_block()
     render_output_block(output_container)
@@ -0,0 +1,377 @@
+import asyncio
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+
+from estimator import fetch_repo_stats, get_estimator
+from runtime import get_event_loop_thread
+from scheduler import get_scheduler
+from utils import (
+    build_osa_command,
+    build_osa_env,
+    build_run_features,
+    is_about_line,
+    parse_report_path,
+)
+from watcher import watch_directory
+
+logger = logging.getLogger(__name__)
+
+# Finished runs are forgotten after this many seconds
+RUN_RETENTION = 24 * 60 * 60
+PRUNE_INTERVAL = 10 * 60
+# Longest stdout line osa-tool may print before the stream is considered broken
+STREAM_LIMIT = 1024 * 1024
+FINAL_STATUSES = ("finished", "failed", "cancelled")
+# Files written inside the cloned repository are copied here, because
+# osa-tool deletes the clone when it finishes
+ARTIFACT_COPIES = ".artifacts"
+
+
+class OsaRun:
+    """State of one osa-tool run, owned by the shared event loop.
+
+    Only the loop thread mutates a run; other threads read it through
+    ``to_dict`` and ``snapshot``.
+    """
+
+    def __init__(
+        self,
+        user: str,
+        options: dict,
+        priority: str,
+        output_dir: str,
+        git_token: str = None,
+        features: dict = None,
+    ) -> None:
+        self.id = uuid.uuid4().hex
+        self.user = user
+        self.options = options
+        self.priority = priority
+        self.output_dir = output_dir
+        self.git_token = git_token
+        self.features = features
+        self.status = "queued"
+        self.logs = []
+        self.about_section = ""
+        self.report_path = None
+        # Files written to the output directory, keyed by relative path
+        self.artifacts = {}
+        self.artifact_events = []
+        # Latest copy task of every nested artifact, keyed by relative path
+        self.artifact_copies = {}
+        self.last_line = None
+        self.exit_code = None
+        self.message = None
+        self.estimate = None
+        self.ticket = None
+        self.finished_at = None
+        self.task = None
+        # Bumped on every change so readers can skip unchanged snapshots
+        self.version = 0
+        self.updated = asyncio.Condition()
+
+    @property
+    def done(self) -> bool:
+        return self.status in FINAL_STATUSES
+
+    def progress(self) -> dict:
+        """Return the cheap, frequently changing part of the run state."""
+        data = {"status": self.status, "estimated_runtime": self.estimate}
+        ticket = self.ticket
+        if ticket is not None and ticket.state == "queued":
+            ahead, wait = get_scheduler().position(ticket)
+            data["queue_position"] = ahead
+            data["estimated_wait"] = wait
+        elif self.status == "running":
+            data["elapsed"] = time.monotonic() - ticket.started_at
+        return data
+
+    def to_dict(self) -> dict:
+        data = {
+            "id": self.id,
+            "repo_url": self.options["repo_url"],
+            "mode": self.options["mode"],
+            "priority": self.priority,
+            "exit_code": self.exit_code,
+            "message": self.message,
+            "report_available": self.get_report_path() is not None,
+            "artifacts": self.list_artifacts(),
+        }
+        data.update(self.progress())
+        return data
+
+    def snapshot(self, log_tail: int = None) -> dict:
+        """Return a copy of the run state that is safe to read from any thread.
+
+        With ``log_tail`` only the last lines of the console output are copied.
+        """
+        logs = self.logs[-log_tail:] if log_tail else list(self.logs)
+        data = self.to_dict()
+        data.update(
+            version=self.version,
+            logs=logs,
+            about_section=self.about_section,
+            artifacts=list(self.artifacts.values()),
+            report_path=self.get_report_path(),
+            last_line=self.last_line,
+        )
+        return data
+
+    async def notify(self) -> None:
+        self.version += 1
+        async with self.updated:
+            self.updated.notify_all()
+
+    def get_report_path(self) -> str:
+        """Return the announced PDF report, or the newest PDF artifact."""
+        if self.report_path is not None:
+            return self.report_path
+        artifacts = list(self.artifacts.values())
+        pdfs = [a for a in artifacts if a["name"].endswith(".pdf")]
+        if pdfs:
+            return max(pdfs, key=lambda artifact: artifact["mtime"])["path"]
+        return None
+
+    def list_artifacts(self) -> list:
+        """Describe the artifacts without their location on the server."""
+        return [
+            {key: artifact[key] for key in ("name", "size", "mtime")}
+            for artifact in list(self.artifacts.values())
+        ]
+
+    def get_artifact(self, name: str) -> dict:
+        artifact = self.artifacts.get(name)
+        if artifact is not None and os.path.isfile(artifact["path"]):
+            return artifact
+        return None
+
+    def artifact_written(self, path: str) -> None:
+        name = os.path.relpath(path, self.output_dir)
+        if os.sep in name:
+            # Copied in a thread so the shared loop keeps serving other runs
+            self.artifact_copies[name] = asyncio.ensure_future(
+                self.copy_artifact(name, path, self.artifact_copies.get(name))
+            )
+        else:
+            self.add_artifact(name, path)
+
+    async def copy_artifact(self, name: str, path: str, previous) -> None:
+        # Copies of the same file must land in the order it was written
+        if previous is not None:
+            await asyncio.wait([previous])
+        copy = os.path.join(self.output_dir, ARTIFACT_COPIES, name)
+        try:
+            await asyncio.to_thread(_copy_file, path, copy)
+        except OSError as e:
+            logger.warning(f"Could not keep a copy of {name}: {e!s}")
+            return
+        self.add_artifact(name, copy)
+
+    async def wait_for_copies(self) -> None:
+        if self.artifact_copies:
+            await asyncio.wait(list(self.artifact_copies.values()))
+
+    def add_artifact(self, name: str, path: str) -> None:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return
+        artifact = {
+            "name": name,
+            "path": path,
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+        }
+        self.artifacts[name] = artifact
+        self.artifact_events.append(artifact)
+        asyncio.ensure_future(self.notify())
+
+    def artifact_removed(self, path: str) -> None:
+        name = os.path.relpath(path, self.output_dir)
+        artifact = self.artifacts.get(name)
+        # Copied artifacts outlive the clone they were written to
+        if artifact is not None and artifact["path"] == path:
+            del self.artifacts[name]
+
+
+def _copy_file(source: str, destination: str) -> None:
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    shutil.copy2(source, destination)
+
+
+async def _read_stream(stream, chunks: list) -> None:
+    while chunk := await stream.read(65536):
+        chunks.append(chunk)
+
+
+async def execute_run(run: OsaRun) -> None:
+    """Wait for a scheduler slot and run osa-tool."""
+    scheduler = get_scheduler()
+    options = run.options
+    process = None
+    stderr_task = None
+    watcher = None
+    try:
+        if run.features is None:
+            stats = await asyncio.to_thread(
+                fetch_repo_stats, options["repo_url"], run.git_token, options["branch"]
+            )
+            run.features = build_run_features(
+                stats, options["mode"], bool(options["article"])
+            )
+        run.estimate = get_estimator().predict(
+            run.features, default=scheduler.mean_duration
+        )
+        run.ticket = scheduler.submit(run.user, run.priority, cost=run.estimate)
+        await scheduler.wait_turn(run.ticket)
+        run.status = "running"
+        await run.notify()
+
+        watcher = watch_directory(
+            run.output_dir,
+            run.artifact_written,
+            run.artifact_removed,
+            ignore=(ARTIFACT_COPIES,),
+        )
+        cmd = build_osa_command(output_dir=run.output_dir, **options)
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            env=build_osa_env(run.git_token),
+            limit=STREAM_LIMIT,
+        )
+        # Drain stderr alongside stdout so a chatty tool cannot fill the pipe
+        stderr_chunks = []
+        stderr_task = asyncio.create_task(_read_stream(process.stderr, stderr_chunks))
+        run.logs.append(f"{cmd}")
+        while stdout_line := await process.stdout.readline():
+            if line := stdout_line.decode(errors="replace").strip():
+                run.last_line = line
+                if report_path := parse_report_path(line):
+                    run.report_path = report_path
+                if is_about_line(line):
+                    run.about_section += line + "\n\n"
+                run.logs.append(line)
+                await run.notify()
+
+        run.exit_code = await process.wait()
+        await stderr_task
+        if run.exit_code == 0:
+            run.message = "Everything is alright"
+            await asyncio.to_thread(
+                get_estimator().record,
+                run.features,
+                time.monotonic() - run.ticket.started_at,
+            )
+        else:
+            run.message = f"Error running OSA tool: {run.last_line}"
+            stderr_output = b"".join(stderr_chunks).decode(errors="replace").strip()
+            logger.error(
+                f"OSA tool execution failed with code {run.exit_code}: {run.last_line}\n{stderr_output}"
+            )
+        run.status = "finished"
+    except asyncio.CancelledError:
+        run.status = "cancelled"
+        run.message = "Run cancelled"
+        raise
+    except Exception as e:
+        run.status = "failed"
+        run.message = f"Error executing OSA tool: {e!s}"
+        logger.error(f"OSA tool execution failed: {e!s}", exc_info=True)
+    finally:
+        # Never give the slot back while osa-tool is still running
+        if process is not None and process.returncode is None:
+            process.kill()
+            await process.wait()
+        if stderr_task is not None and not stderr_task.done():
+            stderr_task.cancel()
+        if watcher is not None:
+            await watcher.close()
+            await run.wait_for_copies()
+        if run.ticket is not None:
+            scheduler.release(
+                run.ticket, completed=run.status == "finished" and run.exit_code == 0
+            )
+        run.finished_at = time.monotonic()
+        await run.notify()
+
+
+class RunManager:
+    """Registry of osa-tool runs executing on the shared event loop."""
+
+    def __init__(self) -> None:
+        self.loop_thread = get_event_loop_thread()
+        self._runs = {}
+        self._lock = threading.Lock()
+        self.loop_thread.call_soon(self._schedule_prune)
+
+    def start_run(
+        self,
+        user: str,
+        options: dict,
+        priority: str,
+        output_dir: str,
+        git_token: str = None,
+        features: dict = None,
+    ) -> OsaRun:
+        """Start a run; must be called on the event loop thread."""
+        run = OsaRun(user, options, priority, output_dir, git_token, features)
+        run.task = asyncio.create_task(execute_run(run))
+        with self._lock:
+            self._runs[run.id] = run
+        logger.info(f"Run {run.id} submitted by {user}")
+        return run
+
+    def submit(self, *args, **kwargs) -> OsaRun:
+        """Start a run from another thread and return it once it is queued."""
+
+        async def start() -> OsaRun:
+            return self.start_run(*args, **kwargs)
+
+        return self.loop_thread.submit(start()).result()
+
+    def get(self, run_id: str) -> OsaRun:
+        with self._lock:
+            return self._runs.get(run_id)
+
+    def cancel(self, run_id: str) -> None:
+        run = self.get(run_id)
+        if run is not None and run.task is not None:
+            self.loop_thread.call_soon(run.task.cancel)
+
+    def _schedule_prune(self) -> None:
+        now = time.monotonic()
+        expired = []
+        with self._lock:
+            for run_id, run in list(self._runs.items()):
+                if run.finished_at is None:
+                    continue
+                if now - run.finished_at > RUN_RETENTION:
+                    expired.append(self._runs.pop(run_id).output_dir)
+        if expired:
+            self.loop_thread.loop.run_in_executor(None, _remove_output_dirs, expired)
+        self.loop_thread.loop.call_later(PRUNE_INTERVAL, self._schedule_prune)
+
+
+def _remove_output_dirs(paths: list) -> None:
+    for path in paths:
+        shutil.rmtree(path, ignore_errors=True)
+        logger.info(f"Removed output directory {path}")
+
+
+_run_manager = None
+_run_manager_lock = threading.Lock()
+
+
+def get_run_manager() -> RunManager:
+    """Return the process-wide run manager."""
+    global _run_manager
+    with _run_manager_lock:
+        if _run_manager is None:
+            _run_manager = RunManager()
+        return _run_manager
@@ -0,0 +1,46 @@
+import asyncio
+import concurrent.futures
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class EventLoopThread:
+    """An asyncio event loop running forever in a daemon thread.
+
+    Every run's subprocess, pipe reading and timers live on this loop, so
+    Streamlit script threads never block on I/O. Other threads talk to it
+    only through thread-safe futures.
+    """
+
+    def __init__(self, name: str = "osa-event-loop") -> None:
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coro) -> concurrent.futures.Future:
+        """Schedule a coroutine on the loop from any thread."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def call_soon(self, callback, *args) -> None:
+        """Run a plain callback on the loop from any thread."""
+        self.loop.call_soon_threadsafe(callback, *args)
+
+
+_event_loop_thread = None
+_event_loop_lock = threading.Lock()
+
+
+def get_event_loop_thread() -> EventLoopThread:
+    """Return the event loop thread shared by all sessions."""
+    global _event_loop_thread
+    with _event_loop_lock:
+        if _event_loop_thread is None:
+            _event_loop_thread = EventLoopThread()
+            logger.info("Started shared event loop thread")
+        return _event_loop_thread
@@ -0,0 +1,280 @@
+import asyncio
+import bisect
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_BULK = "bulk"
+# Lower rank is dispatched first; classes are served with strict priority
+PRIORITY_CLASSES = {PRIORITY_INTERACTIVE: 0, PRIORITY_BULK: 1}
+
+DEFAULT_MAX_CONCURRENT_RUNS = 4
+DEFAULT_MAX_RUNS_PER_USER = 1
+DEFAULT_RUN_DURATION = 300.0
+
+
+class RunTicket:
+    """A single osa-tool run waiting for, or holding, an execution slot."""
+
+    def __init__(self, user: str, priority: str, cost: float) -> None:
+        self.id = uuid.uuid4().hex
+        self.user = user
+        self.priority = priority
+        self.cost = cost
+        self.state = "queued"
+        self.submitted_at = time.monotonic()
+        self.started_at = None
+        self.finished_at = None
+        self.waiter = None
+        # (runs ahead, estimated wait, time of estimate), kept by the scheduler
+        self.position = None
+
+    @property
+    def is_running(self) -> bool:
+        return self.state == "running"
+
+
+class RunScheduler:
+    """Weighted fair queuing of osa-tool runs across users.
+
+    Priority classes are served strictly in order. Within a class the user
+    with the smallest virtual finish time goes next, so every user gets a
+    share of the slots proportional to their weight regardless of how many
+    runs they have queued. Per-user caps limit how many slots one user may
+    hold at a time. Finish times are measured in estimated run seconds, and
+    with shortest-job-first enabled each user's own queue is ordered by
+    estimated runtime, so short runs overtake long ones.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = DEFAULT_MAX_CONCURRENT_RUNS,
+        max_per_user: int = DEFAULT_MAX_RUNS_PER_USER,
+        user_weights: dict = None,
+        default_duration: float = DEFAULT_RUN_DURATION,
+        shortest_job_first: bool = True,
+    ) -> None:
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_per_user = max(1, max_per_user)
+        self.user_weights = user_weights or {}
+        self.mean_duration = default_duration
+        self.shortest_job_first = shortest_job_first
+        self._lock = threading.RLock()
+        self._queues = {rank: {} for rank in PRIORITY_CLASSES.values()}
+        self._running = {}
+        self._virtual_time = {}
+        # Start tag of the most recently dispatched run (the system virtual clock)
+        self._system_virtual_time = 0.0
+
+    def weight(self, user: str) -> float:
+        return max(float(self.user_weights.get(user, 1.0)), 1e-6)
+
+    def submit(
+        self, user: str, priority: str = PRIORITY_INTERACTIVE, cost: float = None
+    ) -> RunTicket:
+        """Queue a run for the given user and dispatch if a slot is free."""
+        if priority not in PRIORITY_CLASSES:
+            raise ValueError(f"Unknown priority class: {priority}")
+        with self._lock:
+            ticket = RunTicket(
+                user, priority, cost if cost is not None else self.mean_duration
+            )
+            if not self._has_work(user):
+                # A user returning from idle must not redeem credit for the time
+                # they were away, so they start at the current virtual clock.
+                self._virtual_time[user] = max(
+                    self._virtual_time.get(user, 0.0), self._system_virtual_time
+                )
+            rank = PRIORITY_CLASSES[priority]
+            queue = self._queues[rank].setdefault(user, deque())
+            if self.shortest_job_first:
+                costs = [queued.cost for queued in queue]
+                queue.insert(bisect.bisect_right(costs, ticket.cost), ticket)
+            else:
+                queue.append(ticket)
+            logger.info(f"Queued run {ticket.id} for {user} ({priority})")
+            self._dispatch()
+            return ticket
+
+    def release(self, ticket: RunTicket, completed: bool = False) -> None:
+        """Free the slot (or queue entry) held by a ticket.
+
+        Only runs that ``completed`` successfully update the mean duration, so
+        cancelled and failed runs do not skew the fallback estimate.
+        """
+        with self._lock:
+            if ticket.state == "running":
+                self._running.pop(ticket.id, None)
+                ticket.finished_at = time.monotonic()
+                if completed:
+                    duration = ticket.finished_at - ticket.started_at
+                    self.mean_duration = 0.8 * self.mean_duration + 0.2 * duration
+            elif ticket.state == "queued":
+                queue = self._queues[PRIORITY_CLASSES[ticket.priority]].get(
+                    ticket.user
+                )
+                if queue and ticket in queue:
+                    queue.remove(ticket)
+            ticket.state = "done"
+            self._dispatch()
+
+    def position(self, ticket: RunTicket) -> tuple[int, float]:
+        """Return the number of runs ahead of a ticket and its estimated wait.
+
+        Positions are recomputed whenever the queue changes, so this is cheap
+        and does not take the scheduler lock.
+        """
+        position = ticket.position
+        if ticket.state != "queued" or position is None:
+            return 0, 0.0
+        ahead, wait, computed_at = position
+        return ahead, max(0.0, wait - (time.monotonic() - computed_at))
+
+    def user_runs(self, user: str) -> list[RunTicket]:
+        """Return the queued and running tickets of a user."""
+        with self._lock:
+            tickets = [t for t in self._running.values() if t.user == user]
+            for queues in self._queues.values():
+                tickets.extend(queues.get(user, ()))
+            return tickets
+
+    async def wait_turn(self, ticket: RunTicket) -> None:
+        """Wait until the ticket is dispatched."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if ticket.state != "queued":
+                return
+            ticket.waiter = (loop, loop.create_future())
+        await ticket.waiter[1]
+
+    def _has_work(self, user: str) -> bool:
+        if any(t.user == user for t in self._running.values()):
+            return True
+        return any(queues.get(user) for queues in self._queues.values())
+
+    def _running_counts(self) -> dict:
+        counts = {}
+        for ticket in self._running.values():
+            counts[ticket.user] = counts.get(ticket.user, 0) + 1
+        return counts
+
+    def _pick(self, queues: dict, counts: dict, virtual_time: dict):
+        """Choose the user whose head-of-line run has the smallest finish tag."""
+        for rank in sorted(queues):
+            candidates = [
+                user
+                for user, queue in queues[rank].items()
+                if queue and counts.get(user, 0) < self.max_per_user
+            ]
+            if candidates:
+                return min(
+                    candidates,
+                    key=lambda user: virtual_time.get(user, 0.0)
+                    + queues[rank][user][0].cost / self.weight(user),
+                ), rank
+        return None, None
+
+    def _dispatch(self) -> None:
+        counts = self._running_counts()
+        while len(self._running) < self.max_concurrent:
+            user, rank = self._pick(self._queues, counts, self._virtual_time)
+            if user is None:
+                break
+            ticket = self._queues[rank][user].popleft()
+            self._system_virtual_time = self._virtual_time.get(user, 0.0)
+            self._virtual_time[user] = (
+                self._system_virtual_time + ticket.cost / self.weight(user)
+            )
+            ticket.state = "running"
+            ticket.started_at = time.monotonic()
+            self._running[ticket.id] = ticket
+            counts[user] = counts.get(user, 0) + 1
+            if ticket.waiter is not None:
+                loop, future = ticket.waiter
+                loop.call_soon_threadsafe(_wake, future)
+            logger.info(f"Dispatched run {ticket.id} for {user}")
+        self._publish_positions()
+
+    def _publish_positions(self) -> None:
+        """Record the expected start of every queued ticket by replaying the
+        dispatch policy forward in time.
+        """
+        now = time.monotonic()
+        queues = {
+            rank: {user: deque(queue) for user, queue in users.items()}
+            for rank, users in self._queues.items()
+        }
+        virtual_time = dict(self._virtual_time)
+        counts = self._running_counts()
+        order = itertools.count()
+        finishing = [
+            (max(0.0, t.cost - (now - t.started_at)), next(order), t.user)
+            for t in self._running.values()
+        ]
+        heapq.heapify(finishing)
+        clock, ahead = 0.0, 0
+        while True:
+            user, rank = None, None
+            if len(finishing) < self.max_concurrent:
+                user, rank = self._pick(queues, counts, virtual_time)
+            if user is None:
+                if not finishing:
+                    return
+                clock, _, done_user = heapq.heappop(finishing)
+                counts[done_user] -= 1
+                continue
+            ticket = queues[rank][user].popleft()
+            ticket.position = (ahead, clock, now)
+            virtual_time[user] = virtual_time.get(user, 0.0) + ticket.cost / (
+                self.weight(user)
+            )
+            counts[user] = counts.get(user, 0) + 1
+            heapq.heappush(finishing, (clock + ticket.cost, next(order), user))
+            ahead += 1
+
+
+def _wake(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+def _parse_weights(value: str) -> dict:
+    weights = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        user, _, weight = item.rpartition("=")
+        try:
+            weights[user.strip()] = float(weight)
+        except ValueError:
+            logger.warning(f"Ignoring invalid user weight: {item}")
+    return weights
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> RunScheduler:
+    """Return the process-wide scheduler shared by all sessions."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RunScheduler(
+                max_concurrent=int(
+                    os.getenv("OSA_MAX_CONCURRENT_RUNS", DEFAULT_MAX_CONCURRENT_RUNS)
+                ),
+                max_per_user=int(
+                    os.getenv("OSA_MAX_RUNS_PER_USER", DEFAULT_MAX_RUNS_PER_USER)
+                ),
+                user_weights=_parse_weights(os.getenv("OSA_USER_WEIGHTS", "")),
+                shortest_job_first=os.getenv("OSA_SHORTEST_JOB_FIRST", "true").lower()
+                in ("1", "true", "yes"),
+            )
+        return _scheduler
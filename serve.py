@@ -0,0 +1,30 @@
+"""Start the Streamlit UI and the HTTP API together in one process.
+
+``streamlit run streamlit_app.py`` only executes the app on the first page
+load, so the API would stay unreachable after a restart until someone opens
+the UI. Starting it here first makes it listen right away while still
+sharing the scheduler with the UI. Extra arguments are passed on to
+``streamlit run``.
+"""
+
+import logging
+import os
+import sys
+
+from dotenv import load_dotenv
+from streamlit.web import cli
+
+from api import start_api_server
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "streamlit_app.py")
+
+if __name__ == "__main__":
+    load_dotenv()
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+    )
+    if not start_api_server():
+        logging.getLogger(__name__).warning(
+            "OSA_API_PORT or OSA_API_TOKENS is not set, starting the UI only"
+        )
+    sys.exit(cli.main(["run", APP_PATH, *sys.argv[1:]], prog_name="streamlit"))
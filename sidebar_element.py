@@ -1,5 +1,8 @@
 import streamlit as st
 
+from scheduler import get_scheduler
+from utils import get_user_id
+
 
 def render_sidebar_element() -> None:
     """Render sidebar with configuration options."""
@@ -11,6 +14,13 @@ def render_sidebar_element() -> None:
             unsafe_allow_html=True,
         )
 
+        runs = get_scheduler().user_runs(get_user_id())
+        if runs:
+            running = sum(ticket.is_running for ticket in runs)
+            st.caption(
+                f"Your runs: **{running}** running, **{len(runs) - running}** queued"
+            )
+
         st.divider()
 
         _, center, _ = st.columns([0.2, 0.6, 0.2])
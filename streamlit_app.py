@@ -5,6 +5,7 @@ import tempfile
 import streamlit as st
 from dotenv import load_dotenv
 
+from api import start_api_server
 from configuration_tab import render_configuration_tab
 from login_screen import render_login_screen
 from main_tab import render_main_tab
@@ -32,10 +33,27 @@ def setup_page_config() -> None:
     )
 
 
+@st.cache_resource
+def start_background_services() -> bool:
+    """Start process-wide services once per Streamlit server.
+
+    Under ``streamlit run`` this only happens on the first page load; serve.py
+    starts the API together with the server instead.
+    """
+    started = start_api_server()
+    if started:
+        logger.warning(
+            "OSA API started on the first page load and was unreachable until "
+            "now; launch with `python serve.py` to start it with the server"
+        )
+    return started
+
+
 def main() -> None:
     """Run the Streamlit application."""
 
     setup_page_config()
+    start_background_services()
 
     if not st.user.is_logged_in:
         render_login_screen()
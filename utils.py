@@ -1,110 +1,232 @@
-import asyncio
+import hashlib
 import logging
 import os
 import re
 
 import streamlit as st
 
+from estimator import fetch_repo_stats, get_estimator
+from scheduler import get_scheduler
+
 logger = logging.getLogger(__name__)
 
+REPORT_PATTERN = re.compile(r"PDF report successfully created in (\/.*.pdf)")
+ABOUT_PATTERN = re.compile(
+    r"You can add the following|- Description:|- Homepage:|- Topics:|Please review and add them to your repository"
+)
+
+
+def get_user_id() -> str:
+    """Return the identity used to share run slots fairly between users."""
+    return st.user.get("email") or st.user.get("name") or "anonymous"
+
+
+def format_duration(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    if minutes:
+        return f"{minutes} min {seconds} s"
+    return f"{seconds} s"
+
+
+class _RepoStatsUnavailable(Exception):
+    pass
+
+
+@st.cache_data(ttl=600, show_spinner=False)
+def _cached_repo_stats(
+    repo_url: str, branch: str, token_hash: str, _git_token: str
+) -> dict:
+    # Failed lookups are raised so that only the short-lived cache keeps them
+    if not (stats := fetch_repo_stats(repo_url, _git_token, branch)):
+        raise _RepoStatsUnavailable
+    return stats
+
 
-async def run_osa_tool(output_container) -> None:
-    """Run the osa-tools application."""
+@st.cache_data(ttl=60, show_spinner=False)
+def _lookup_repo_stats(
+    repo_url: str, branch: str, token_hash: str, _git_token: str
+) -> dict:
     try:
-        # Clear streamlit state
-        if "output_report_path" in st.session_state:
-            del st.session_state["output_report_path"]
-        if "output_report_filename" in st.session_state:
-            del st.session_state["output_report_filename"]
-        if "output_about_section" in st.session_state:
-            del st.session_state["output_about_section"]
-
-        # Создаем копию текущих переменных окружения
-        env = os.environ.copy()
-        # NOTE: Force Unbuffered Output & Adjust Terminal Width
-        env.update(
-            {"COLUMNS": "200", "TERM": "xterm-256color", "PYTHONUNBUFFERED": "1"}
-        )
+        return _cached_repo_stats(repo_url, branch, token_hash, _git_token)
+    except _RepoStatsUnavailable:
+        return {}
+
+
+def get_repo_stats(repo_url: str, branch: str, git_token: str) -> dict:
+    """Return repository stats, cached separately for every token."""
+    token_hash = hashlib.sha256(git_token.encode()).hexdigest() if git_token else ""
+    return _lookup_repo_stats(repo_url, branch, token_hash, git_token)
+
+
+def collect_run_features() -> dict:
+    """Describe the pending run for the runtime estimator."""
+    stats = get_repo_stats(
+        st.session_state.repo_url,
+        st.session_state.get("branch"),
+        st.session_state.git_token,
+    )
+    return build_run_features(
+        stats,
+        st.session_state.mode_select,
+        "article" in st.session_state,
+    )
+
+
+def estimate_runtime(features: dict) -> float:
+    return get_estimator().predict(features, default=get_scheduler().mean_duration)
+
+
+def build_osa_env(git_token: str = None) -> dict:
+    """Return the environment for an osa-tool subprocess."""
+    # Создаем копию текущих переменных окружения
+    env = os.environ.copy()
+    # NOTE: Force Unbuffered Output & Adjust Terminal Width
+    env.update({"COLUMNS": "200", "TERM": "xterm-256color", "PYTHONUNBUFFERED": "1"})
+
+    # Убедимся, что GIT_TOKEN передается в процесс
+    if git_token:
+        env["GIT_TOKEN"] = git_token
+    return env
 
-        # Убедимся, что GIT_TOKEN передается в процесс
-        if st.session_state.git_token:
-            env["GIT_TOKEN"] = st.session_state.git_token
-
-        cmd = [
-            "osa-tool",
-            "-r",
-            st.session_state.repo_url,
-            "-m",
-            st.session_state.mode_select,
-            "-o",
-            st.session_state.tmpdirname,
-            "--web-mode",
-            "--delete-dir",
-        ]
-
-        if "article" in st.session_state:
-            cmd.extend(("--article", st.session_state.article.get("data")))
-        if "branch" in st.session_state:
-            cmd.extend(("--branch", st.session_state.branch))
-        if st.session_state.no_fork:
-            cmd.append("--no-fork")
-        if st.session_state.no_pull_request:
-            cmd.append("--no-pull-request")
-
-        process = await asyncio.create_subprocess_exec(
-            *cmd,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-            env=env,
+
+def build_osa_command(
+    repo_url: str,
+    mode: str,
+    output_dir: str,
+    article: str = None,
+    branch: str = None,
+    no_fork: bool = False,
+    no_pull_request: bool = False,
+) -> list:
+    """Return the osa-tool command line for a run."""
+    cmd = [
+        "osa-tool",
+        "-r",
+        repo_url,
+        "-m",
+        mode,
+        "-o",
+        output_dir,
+        "--web-mode",
+        "--delete-dir",
+    ]
+
+    if article:
+        cmd.extend(("--article", article))
+    if branch:
+        cmd.extend(("--branch", branch))
+    if no_fork:
+        cmd.append("--no-fork")
+    if no_pull_request:
+        cmd.append("--no-pull-request")
+    return cmd
+
+
+def parse_report_path(line: str):
+    """Return the PDF report path announced in an osa-tool output line."""
+    if match := REPORT_PATTERN.search(line):
+        return match.group(1)
+    return None
+
+
+def is_about_line(line: str) -> bool:
+    """Check whether an osa-tool output line belongs to the About section."""
+    return ABOUT_PATTERN.search(line) is not None
+
+
+def build_run_features(stats: dict, mode: str, article: bool) -> dict:
+    """Describe a run for the runtime estimator."""
+    features = dict(stats)
+    features["mode"] = mode
+    features["article"] = article
+    return features
+
+
+def collect_run_options() -> dict:
+    """Return the osa-tool options chosen in the current session."""
+    return {
+        "repo_url": st.session_state.repo_url,
+        "mode": st.session_state.mode_select,
+        "article": st.session_state.get("article", {}).get("data"),
+        "branch": st.session_state.get("branch"),
+        "no_fork": st.session_state.no_fork,
+        "no_pull_request": st.session_state.no_pull_request,
+    }
+
+
+def clear_run_output() -> None:
+    for key in (
+        "output_logs",
+        "output_exit_code",
+        "output_message",
+        "output_report_path",
+        "output_report_filename",
+        "output_about_section",
+        "output_artifacts",
+        "output_files_removed",
+    ):
+        if key in st.session_state:
+            del st.session_state[key]
+
+
+def drop_removed_run_output() -> None:
+    """Forget report and artifacts whose files were deleted with the run."""
+    paths = [a["path"] for a in st.session_state.get("output_artifacts", ())]
+    if "output_report_path" in st.session_state:
+        paths.append(st.session_state.output_report_path)
+    if not paths or any(os.path.isfile(path) for path in paths):
+        return
+    for key in ("output_report_path", "output_report_filename", "output_artifacts"):
+        st.session_state.pop(key, None)
+    st.session_state.output_files_removed = True
+
+
+def store_run_output(snapshot: dict) -> None:
+    """Copy the results of a finished run into the session state."""
+    st.session_state.output_logs = "".join(line + "\n" for line in snapshot["logs"])
+    if snapshot["exit_code"] == 0:
+        st.session_state.output_exit_code = 0
+        st.session_state.output_message = "Everything is alright"
+    elif snapshot["exit_code"] is not None:
+        st.session_state.output_exit_code = snapshot["exit_code"]
+        st.session_state.output_message = (
+            f"**Error running OSA tool**: `{snapshot['last_line']}`"
         )
+    else:
+        st.session_state.output_exit_code = -1
+        st.session_state.output_message = snapshot["message"]
+    if report_path := snapshot["report_path"]:
+        st.session_state.output_report_path = report_path
+        st.session_state.output_report_filename = report_path.split("/")[-1]
+    if snapshot["about_section"]:
+        st.session_state.output_about_section = snapshot["about_section"]
+    st.session_state.output_artifacts = snapshot["artifacts"]
 
-        st.session_state.output_logs = f"{cmd}\n"
-        last_line = None
-
-        while True:
-            stdout_line = await process.stdout.readline()
-            if not stdout_line:
-                break
-
-            if line := stdout_line.decode().strip():
-                last_line = line
-                if match := re.search(
-                    r"PDF report successfully created in (\/.*.pdf)", line
-                ):
-                    st.session_state.output_report_path = match.group(1)
-                    st.session_state.output_report_filename = match.group(1).split("/")[
-                        -1
-                    ]
-                if match := re.search(
-                    r"(.*You can add the following.*|.*- Description:.*|.*- Homepage:.*|.*- Topics:.*|.*Please review and add them to your repository.*)",
-                    line,
-                ):
-                    if "output_about_section" not in st.session_state:
-                        st.session_state.output_about_section = ""
-                    st.session_state.output_about_section += line + "\n\n"
-
-                st.session_state.output_logs += line + "\n"
-                # TODO: developer only
-                output_container.expander(
-                    "See Console Output", icon=":material/terminal:"
-                ).code(
-                    st.session_state.output_logs,
-                    height=350,
-                )
 
-        st.session_state.output_exit_code = await process.wait()
-        if st.session_state.output_exit_code == 0:
-            st.session_state.output_message = "Everything is alright"
-        else:
-            stderr_output = await process.stderr.read()
-            error_message = stderr_output.decode().strip()
-            st.session_state.output_message = (
-                f"**Error running OSA tool**: `{last_line}`"
-            )
-            logger.error(
-                f"OSA tool execution failed with code {st.session_state.output_exit_code}: {last_line}"
-            )
-
-    except Exception as e:
-        st.error(f"Error executing OSA tool: {e!s}")
-        logger.error(f"OSA tool execution failed: {e!s}", exc_info=True)
+def render_artifact_picker(artifacts: list, key_prefix: str) -> None:
+    """Offer one artifact at a time for download, reading it only once chosen."""
+    by_name = {a["name"]: a for a in artifacts if os.path.isfile(a["path"])}
+    if not by_name:
+        st.caption("No artifacts yet.")
+        return
+    left, right = st.columns([0.7, 0.3], vertical_alignment="bottom")
+    with left:
+        name = st.selectbox(
+            "Artifact",
+            options=list(by_name),
+            index=None,
+            placeholder="Choose a file to download",
+            key=f"{key_prefix}_artifact",
+        )
+    with right:
+        if name is not None:
+            artifact = by_name[name]
+            with open(artifact["path"], "rb") as file:
+                st.download_button(
+                    label="Download",
+                    data=file.read(),
+                    file_name=os.path.basename(artifact["path"]),
+                    icon=":material/download:",
+                    key=f"{key_prefix}_download",
+                    use_container_width=True,
+                )
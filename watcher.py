@@ -0,0 +1,371 @@
+import abc
+import asyncio
+import ctypes
+import ctypes.util
+import logging
+import os
+import struct
+import sys
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = 1.0
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENT_HEADER = struct.Struct("iIII")
+
+
+# Files osa-tool may generate inside the cloned repository, relative to its root
+CHECKOUT_ARTIFACTS = {
+    "README.md",
+    "requirements.txt",
+    "LICENSE",
+    "CONTRIBUTING.md",
+    "CODE_OF_CONDUCT.md",
+    "SECURITY.md",
+}
+# Directories of a cloned repository where generated files (workflows,
+# community documentation) are written
+CHECKOUT_ARTIFACT_DIRS = {".github"}
+
+
+def _is_checkout(path: str) -> bool:
+    return os.path.isdir(os.path.join(path, ".git"))
+
+
+def _checkout_of(path: str, root: str):
+    """Return the cloned repository containing a path inside root, if any."""
+    directory = path
+    while True:
+        if _is_checkout(directory):
+            return directory
+        if directory == root or len(directory) <= len(root):
+            return None
+        directory = os.path.dirname(directory)
+
+
+def _should_descend(path: str, root: str, ignore: tuple) -> bool:
+    """Check whether a directory may contain artifacts.
+
+    Git metadata is never watched. Inside a cloned repository only its root
+    and the directories of generated files are, so a large working copy does
+    not cost one watch per directory.
+    """
+    relative = os.path.relpath(path, root).split(os.sep)
+    if ".git" in relative or relative[0] in ignore:
+        return False
+    checkout = _checkout_of(path, root)
+    if checkout is None or checkout == path:
+        return True
+    return os.path.relpath(path, checkout).split(os.sep)[0] in CHECKOUT_ARTIFACT_DIRS
+
+
+def _is_artifact(path: str, root: str, ignore: tuple) -> bool:
+    directory = os.path.dirname(path)
+    if not _should_descend(directory, root, ignore):
+        return False
+    checkout = _checkout_of(directory, root)
+    if checkout is None:
+        return True
+    relative = os.path.relpath(path, checkout)
+    return (
+        relative in CHECKOUT_ARTIFACTS
+        or relative.split(os.sep)[0] in CHECKOUT_ARTIFACT_DIRS
+    )
+
+
+def _walk_files(root: str, ignore: tuple):
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [
+            name
+            for name in dirnames
+            if _should_descend(os.path.join(dirpath, name), root, ignore)
+        ]
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            if _is_artifact(path, root, ignore):
+                yield path
+
+
+class DirectoryWatcher(abc.ABC):
+    """Report files in an output directory as soon as they are written.
+
+    ``on_written`` is called with the path of every file that is closed
+    after writing (or moved into the tree) and ``on_removed`` with the path
+    of every reported file that disappears. Inside cloned repositories only
+    the files osa-tool creates or rewrites after the clone are reported, and
+    top-level directories named in ``ignore`` are skipped. Both callbacks
+    run on the event loop thread.
+    """
+
+    def __init__(self, root: str, on_written, on_removed, ignore: tuple = ()) -> None:
+        self.root = root
+        self.on_written = on_written
+        self.on_removed = on_removed
+        self.ignore = ignore
+        self.reported = set()
+        # Size and mtime of files as git checked them out, keyed by path
+        self.checked_out = {}
+
+    @abc.abstractmethod
+    def start(self) -> None:
+        """Begin reporting files; called on the event loop thread."""
+
+    async def close(self) -> None:
+        """Stop watching after a last scan for anything that was missed."""
+        self.scan()
+
+    def written(self, path: str) -> None:
+        if not os.path.isfile(path) or not _is_artifact(path, self.root, self.ignore):
+            return
+        checkout = _checkout_of(os.path.dirname(path), self.root)
+        if checkout is not None and not self.generated(path, checkout):
+            return
+        self.reported.add(path)
+        self.on_written(path)
+
+    def generated(self, path: str, checkout: str) -> bool:
+        """Tell a file osa-tool wrote in a clone from one git checked out.
+
+        Git writes its index after the working tree, so a file first seen no
+        newer than the index came from the clone. It is only reported once its
+        size or mtime changes.
+        """
+        if path in self.reported:
+            return True
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        current = (stat.st_size, stat.st_mtime_ns)
+        if path in self.checked_out:
+            return self.checked_out[path] != current
+        try:
+            index_mtime = os.stat(os.path.join(checkout, ".git", "index")).st_mtime_ns
+        except OSError:
+            index_mtime = None
+        if index_mtime is None or stat.st_mtime_ns <= index_mtime:
+            self.checked_out[path] = current
+            return False
+        return True
+
+    def removed(self, path: str) -> None:
+        prefix = path + os.sep
+        for checked_out in [
+            p for p in self.checked_out if p == path or p.startswith(prefix)
+        ]:
+            del self.checked_out[checked_out]
+        for reported in [p for p in self.reported if p == path or p.startswith(prefix)]:
+            self.reported.discard(reported)
+            self.on_removed(reported)
+
+    def scan(self) -> None:
+        """Reconcile the reported files with the directory contents."""
+        present = set(_walk_files(self.root, self.ignore))
+        for path in self.reported - present:
+            self.removed(path)
+        for path in present - self.reported:
+            self.written(path)
+
+
+class InotifyWatcher(DirectoryWatcher):
+    """Watch a directory tree with Linux inotify."""
+
+    def __init__(self, root: str, on_written, on_removed, ignore: tuple, libc) -> None:
+        super().__init__(root, on_written, on_removed, ignore)
+        self.libc = libc
+        self.fd = None
+        self.watches = {}
+
+    def start(self) -> None:
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        try:
+            self.add_tree(self.root)
+        except OSError:
+            os.close(self.fd)
+            self.fd = None
+            raise
+        asyncio.get_running_loop().add_reader(self.fd, self.read_events)
+
+    async def close(self) -> None:
+        if self.fd is not None:
+            asyncio.get_running_loop().remove_reader(self.fd)
+            os.close(self.fd)
+            self.fd = None
+        await super().close()
+
+    def add_tree(self, path: str) -> None:
+        """Watch a directory and its subdirectories, reporting existing files."""
+        if not _should_descend(path, self.root, self.ignore):
+            return
+        for dirpath, dirnames, filenames in os.walk(path):
+            dirnames[:] = [
+                name
+                for name in dirnames
+                if _should_descend(os.path.join(dirpath, name), self.root, self.ignore)
+            ]
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(dirpath), WATCH_MASK)
+            if wd < 0:
+                # Without the root watch nothing would be reported until close()
+                if dirpath == self.root:
+                    errno = ctypes.get_errno()
+                    raise OSError(errno, f"inotify_add_watch failed for {dirpath}")
+                logger.warning(f"Could not watch {dirpath}: errno {ctypes.get_errno()}")
+                continue
+            self.watches[wd] = dirpath
+            # Files written before the watch existed produce no events
+            for filename in filenames:
+                self.written(os.path.join(dirpath, filename))
+
+    def remove_tree(self, path: str) -> None:
+        prefix = path + os.sep
+        for wd, dirpath in list(self.watches.items()):
+            if dirpath == path or dirpath.startswith(prefix):
+                self.libc.inotify_rm_watch(self.fd, wd)
+                del self.watches[wd]
+        self.removed(path)
+
+    def checkout_created(self, path: str) -> None:
+        """Narrow the watches of a directory that turned out to be a clone."""
+        prefix = path + os.sep
+        for wd, dirpath in list(self.watches.items()):
+            if dirpath.startswith(prefix) and not _should_descend(
+                dirpath, self.root, self.ignore
+            ):
+                self.libc.inotify_rm_watch(self.fd, wd)
+                del self.watches[wd]
+        for reported in [p for p in self.reported if p.startswith(prefix)]:
+            if not _is_artifact(reported, self.root, self.ignore):
+                self.reported.discard(reported)
+                self.on_removed(reported)
+
+    def read_events(self) -> None:
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset : offset + length].rstrip(b"\0"))
+            offset += length
+            self.handle_event(wd, mask, name)
+
+    def handle_event(self, wd: int, mask: int, name: str) -> None:
+        if mask & IN_Q_OVERFLOW:
+            logger.warning(f"Inotify queue overflow, rescanning {self.root}")
+            self.scan()
+            return
+        if mask & IN_IGNORED:
+            self.watches.pop(wd, None)
+            return
+        directory = self.watches.get(wd)
+        if directory is None:
+            return
+        path = os.path.join(directory, name)
+        if mask & IN_ISDIR:
+            if name == ".git" and mask & (IN_CREATE | IN_MOVED_TO):
+                self.checkout_created(directory)
+            elif mask & (IN_CREATE | IN_MOVED_TO):
+                self.add_tree(path)
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                self.remove_tree(path)
+        elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+            self.written(path)
+        elif mask & (IN_DELETE | IN_MOVED_FROM):
+            self.removed(path)
+
+
+class PollingWatcher(DirectoryWatcher):
+    """Watch a directory tree by periodically comparing file sizes and mtimes.
+
+    A file is reported once it has stayed unchanged for one poll interval.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        on_written,
+        on_removed,
+        ignore: tuple = (),
+        interval: float = POLL_INTERVAL,
+    ) -> None:
+        super().__init__(root, on_written, on_removed, ignore)
+        self.interval = interval
+        self.pending = {}
+        self.reported_stats = {}
+        self.task = None
+
+    def start(self) -> None:
+        self.task = asyncio.get_running_loop().create_task(self.poll())
+
+    async def close(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+        await super().close()
+
+    async def poll(self) -> None:
+        while True:
+            self.check()
+            await asyncio.sleep(self.interval)
+
+    def check(self) -> None:
+        current = {}
+        for path in _walk_files(self.root, self.ignore):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            current[path] = (stat.st_size, stat.st_mtime_ns)
+        for path in set(self.reported_stats) - set(current):
+            del self.reported_stats[path]
+            self.removed(path)
+        for path, stats in current.items():
+            if self.reported_stats.get(path) == stats:
+                continue
+            if self.pending.get(path) == stats:
+                self.reported_stats[path] = stats
+                self.written(path)
+        self.pending = current
+
+
+def _load_libc():
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1, libc.inotify_add_watch, libc.inotify_rm_watch
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+_libc = _load_libc()
+
+
+def watch_directory(
+    root: str, on_written, on_removed, ignore: tuple = ()
+) -> DirectoryWatcher:
+    """Start watching a directory on the running loop, preferring inotify."""
+    if _libc is not None and os.getenv("OSA_WATCHER", "inotify") != "polling":
+        watcher = InotifyWatcher(root, on_written, on_removed, ignore, _libc)
+        try:
+            watcher.start()
+            return watcher
+        except OSError as e:
+            logger.warning(f"Inotify unavailable, falling back to polling: {e!s}")
+    watcher = PollingWatcher(root, on_written, on_removed, ignore)
+    watcher.start()
+    return watcher